@@ -1,13 +1,23 @@
 class Animal:
+    # __slots__로 인스턴스 __dict__ 제거 → 메모리 절약 + 속성 접근 가속
+    # (하위 클래스도 __slots__를 선언해야 효과가 유지됨)
+    __slots__ = ("name", "_msg")
+
     def __init__(self, name):
         self.name = name
+        # name은 생성 후 바뀌지 않으므로 메시지를 미리 만들어 둠
+        # → speak()가 매번 f-string을 조립하지 않고 속성 로드 한 번으로 끝남
+        self._msg = f"{name}가 소리를 냅니다."
 
     def speak(self):
-        return f"{self.name}가 소리를 냅니다."
+        return self._msg
 
 class Cat(Animal):
-    def speak(self):  # 메서드 오버라이딩
-        return f"{self.name}가 야옹 합니다."
+    __slots__ = ()
+
+    def __init__(self, name):  # 메서드 오버라이딩
+        super().__init__(name)
+        self._msg = f"{name}가 야옹 합니다."
 
 cat1 = Cat("나비")
 print(cat1.speak())
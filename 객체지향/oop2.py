@@ -1,19 +1,69 @@
+import numba
+import numpy as np
+
+
+@numba.njit(cache=True)
+def _apply_batch(balances, deltas):
+    # 거래 로그 재생처럼 호출 횟수가 많은 배치 입출금용 JIT 커널.
+    # 파이썬 인터프리터 루프 대신 컴파일된 머신 코드로 N건을 한 번에 처리.
+    for i in range(balances.shape[0]):
+        b = balances[i] + deltas[i]
+        if b < 0:  # 잔액 부족 → 해당 거래만 건너뜀
+            continue
+        balances[i] = b
+
+
 class BankAccount:
+    # 이름 맹글링(__balance) 대신 관례적 비공개(_balance) + __slots__
+    # → dict 조회 없이 슬롯 디스크립터로 바로 접근
+    __slots__ = ("owner", "_balance")
+
     def __init__(self, owner, balance=0):
         self.owner = owner
-        self.__balance = balance  # private 속성
+        self._balance = balance  # private 속성
 
     def deposit(self, amount):
-        self.__balance += amount
+        self._balance += amount
 
     def withdraw(self, amount):
-        if amount <= self.__balance:
-            self.__balance -= amount
+        if amount <= self._balance:
+            self._balance -= amount
         else:
             print("잔액 부족!")
 
     def get_balance(self):
-        return self.__balance
+        return self._balance
+
+    @staticmethod
+    def apply_batch(balances, deltas):
+        """여러 계좌의 잔액 배열(SoA)에 증감분 배열을 한 번에 적용한다.
+
+        balances, deltas: 같은 길이의 np.int64 배열. balances는 제자리 갱신.
+        """
+        _apply_batch(balances, deltas)
+
+class BankAccountTable:
+    # 계좌를 객체 리스트(AoS)가 아니라 병렬 배열(SoA)로 보관.
+    # balances가 연속 메모리라서 일괄 입금이 C 루프 한 번으로 끝난다.
+    __slots__ = ("owners", "balances")
+
+    def __init__(self, owners, balances):
+        self.owners = np.asarray(owners, dtype=object)
+        self.balances = np.asarray(balances, dtype=np.int64)
+
+    def deposit(self, idx, amount):
+        self.balances[idx] += amount
+
+    def batch_deposit(self, deltas):
+        np.add(self.balances, deltas, out=self.balances)
+
+    def batch_apply(self, deltas):
+        # 잔액 부족 거래는 건너뛰는 JIT 경로 (위 _apply_batch 재사용)
+        _apply_batch(self.balances, np.asarray(deltas, dtype=np.int64))
+
+    def get_balance(self, idx):
+        return self.balances[idx]
+
 
 account = BankAccount("홍길동", 1000)
 account.deposit(500)
@@ -1,24 +1,82 @@
-from abc import ABC, abstractmethod
+import functools
+import math
 
-class Shape(ABC):  # 추상 클래스
-    @abstractmethod
-    def area(self):
-        pass
+import numba
+import numpy as np
+
+
+@numba.njit(parallel=True, fastmath=True)
+def _sum_areas(rw, rh, cr):
+    # 사각형/원 배치의 총 넓이를 한 패스로 합산하는 융합 커널.
+    # 중간 배열(ws*hs) 할당 없이 SIMD + 스레드 병렬로 처리.
+    s = 0.0
+    for i in numba.prange(rw.shape[0]):
+        s += rw[i] * rh[i]
+    for j in numba.prange(cr.shape[0]):
+        s += 3.141592653589793 * cr[j] * cr[j]
+    return s
+
+class Shape:
+    # ABCMeta는 인스턴스 생성/isinstance마다 메타클래스 비용을 내므로,
+    # area() 구현 검사를 클래스 정의 시점 한 번으로 옮긴다.
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # assert는 python -O에서 사라지므로 예외로 강제한다
+        if "area" not in cls.__dict__:
+            raise TypeError(f"{cls.__name__} must define area()")
 
 class Rectangle(Shape):
     def __init__(self, w, h):
         self.w, self.h = w, h
+        # 치수는 생성 후 불변이므로 넓이를 미리 계산해 둠
+        self._area = w * h
 
     def area(self):
-        return self.w * self.h
+        return self._area
 
 class Circle(Shape):
+    _PI = math.pi  # 전역 조회 없이 쓰는 클래스 상수 (3.14보다 정확)
+
     def __init__(self, r):
         self.r = r
+        self._area = self._PI * r * r
 
     def area(self):
-        return 3.14 * self.r * self.r
+        return self._area
+
+# 가상 메서드 호출(s.area())은 MRO 탐색 + 바운드 메서드 생성을 매번 치른다.
+# singledispatch는 C로 구현된 타입→함수 테이블 조회라 핫 루프에서 더 싸다.
+@functools.singledispatch
+def area(shape):
+    raise NotImplementedError(f"area not registered for {type(shape).__name__}")
+
+@area.register
+def _(s: Rectangle):
+    return s._area
+
+@area.register
+def _(s: Circle):
+    return s._area
+
+class ShapeBatch:
+    # 도형이 아주 많을 때는 객체 리스트 대신 SoA 배열로 보관.
+    # 파이썬 메서드 디스패치 N번 대신 NumPy 커널 한 번으로 넓이를 계산.
+    __slots__ = ("rect_w", "rect_h", "circ_r")
+
+    def __init__(self, rect_w, rect_h, circ_r):
+        self.rect_w = np.asarray(rect_w, dtype=np.float64)
+        self.rect_h = np.asarray(rect_h, dtype=np.float64)
+        self.circ_r = np.asarray(circ_r, dtype=np.float64)
+
+    def areas(self):
+        return np.concatenate(
+            [self.rect_w * self.rect_h, math.pi * self.circ_r ** 2]
+        )
+
+    def total_area(self):
+        return _sum_areas(self.rect_w, self.rect_h, self.circ_r)
+
 
 shapes = [Rectangle(3, 4), Circle(5)]
 for s in shapes:
-    print(f"도형의 넓이: {s.area()}")
+    print(f"도형의 넓이: {area(s)}")
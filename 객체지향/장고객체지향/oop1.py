@@ -1,9 +1,57 @@
-from django.db import models
-
-class Product(models.Model):  
-    name = models.CharField(max_length=100)
-    price = models.DecimalField(max_digits=10, decimal_places=2)
-
-    def apply_discount(self, percent):  
-        self.price *= (1 - percent/100)
-        return self.price
+import functools
+from decimal import Decimal
+
+from django.db import models
+
+
+@functools.cache
+def _discounted(price_cents, percent_bp):
+    # (가격, 할인율) 조합은 요청 안에서 반복 조회되는 일이 많아 메모이즈.
+    # 순수 정수 함수라 캐시 키도 가볍다. (메모리 상한이 필요하면
+    # 요청 종료 시그널에서 _discounted.cache_clear() 호출)
+    return price_cents * (10000 - percent_bp) // 10000
+
+class ProductQuerySet(models.QuerySet):
+    def with_related(self):
+        # 뷰마다 select_related/prefetch_related를 제각각 붙이는 대신
+        # 표준 조인 세트를 한 곳에서 선언해 N+1을 원천 차단.
+        # (FK: select_related, M2M: prefetch_related — 관계가 생기면 여기에 추가)
+        return self.select_related()
+
+    def lite(self):
+        # 목록 화면처럼 이름만 쓰는 곳: 컬럼을 줄여 전송 바이트와
+        # 미사용 필드의 파이썬 객체 생성을 아낀다.
+        # (Prefetch와 조합 시 FK id 컬럼은 반드시 포함할 것)
+        return self.only("id", "name")
+
+
+class Product(models.Model):
+    # 인덱스 없이는 filter(name=...)가 풀 스캔 → B-tree 프로브로 전환
+    name = models.CharField(max_length=100, db_index=True)
+    # Decimal 연산(타입 강제 변환 + quantize) 대신 정수 원 단위(cents)로 저장.
+    # 할인 계산이 C 정수 곱셈/나눗셈 한 번으로 끝난다.
+    price_cents = models.BigIntegerField()
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=["price_cents"])]  # 가격 범위 조회용
+        ordering = ["id"]  # 비인덱스 컬럼 암묵 정렬 방지
+
+    @property
+    def price(self):
+        # 표시용으로만 Decimal로 환산
+        return Decimal(self.price_cents) / 100
+
+    def apply_discount(self, percent_bp):
+        # percent_bp: 베이시스 포인트(100bp = 1%) 정수
+        self.price_cents = _discounted(self.price_cents, percent_bp)
+        return self.price_cents
+
+    @classmethod
+    def apply_discount_bulk(cls, qs, percent_bp):
+        # 인스턴스 루프 + save() N번(쓰기 N+1) 대신 UPDATE 한 문장.
+        # 계산은 DB가 수행하므로 파이썬 쪽 객체 생성이 없다.
+        return qs.update(
+            price_cents=models.F("price_cents") * (10000 - percent_bp) / 10000
+        )
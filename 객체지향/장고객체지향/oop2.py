@@ -1,10 +1,15 @@
-from django.views import View
-from django.http import HttpResponse
-
-class HelloView(View):
-    def get(self, request):
-        return HttpResponse("Hello, World!")
-
-class GoodbyeView(HelloView):  
-    def get(self, request): 
-        return HttpResponse("Goodbye!")
+from django.views import View
+from django.http import HttpResponse
+
+# 응답 본문은 상수이므로 바이트를 모듈 로드 시 한 번만 준비
+_HELLO_BODY = b"Hello, World!"
+_GOODBYE_BODY = b"Goodbye!"
+
+class HelloView(View):
+    # async get → ASGI에서 sync_to_async 스레드 풀 홉 없이 이벤트 루프에서 처리
+    async def get(self, request):
+        return HttpResponse(_HELLO_BODY, content_type="text/plain")
+
+class GoodbyeView(HelloView):
+    async def get(self, request):
+        return HttpResponse(_GOODBYE_BODY, content_type="text/plain")
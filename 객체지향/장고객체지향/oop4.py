@@ -1,9 +1,34 @@
-class SimpleMiddleware:
-    def __init__(self, get_response):
-        self.get_response = get_response 
-
-    def __call__(self, request):  
-        print(f"[요청 시작] {request.path}")
-        response = self.get_response(request)
-        print(f"[응답 완료] {response.status_code}")
-        return response
+import logging
+import logging.handlers
+import queue
+
+# print()는 요청마다 stdout 락 + write 시스템콜을 잡는다.
+# QueueHandler로 로그를 큐에 넣기만 하고, 실제 I/O는 QueueListener
+# 백그라운드 스레드가 처리해 핫 패스에서 떼어낸다.
+logger = logging.getLogger("req")
+_log_queue = queue.Queue(-1)
+_listener = logging.handlers.QueueListener(_log_queue, logging.StreamHandler())
+_listener.start()
+logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+logger.setLevel(logging.INFO)
+
+
+class SimpleMiddleware:
+    # 순수 ASGI 미들웨어: sync 미들웨어처럼 sync_to_async 스레드 홉이나
+    # Request/Response 객체 생성 비용 없이 이벤트 루프에서 바로 실행된다.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        logger.info("[요청 시작] %s", scope["path"])
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                logger.info("[응답 완료] %s", message["status"])
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
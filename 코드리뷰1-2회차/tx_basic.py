@@ -1,72 +1,102 @@
-from decimal import Decimal
-from django.db import transaction, IntegrityError
-from django.db.models import F
-from .models import Product, Order, OrderItem, Ledger
-
-# 1) 기본: atomic 블록 하나로 '모두 성공/모두 실패'
-@transaction.atomic
-def create_order(*, user, items: list[dict]) -> Order:
-    """items = [{'sku': 'A', 'qty': 2}, ...]"""
-    # 필요한 상품을 한 번에 잠그고(select_for_update) 가져오기 → 동시성/초과판매 방지
-    skus = [i['sku'] for i in items]
-    products = {p.sku: p for p in Product.objects.select_for_update().filter(sku__in=skus)}
-
-    order = Order.objects.create(user=user, total_amount=Decimal('0.00'), status='pending')
-    total = Decimal('0.00')
-    bulk_items = []
-
-    for it in items:
-        p = products[it['sku']]
-        q = int(it['qty'])
-        if p.stock < q:
-            raise ValueError(f"Out of stock: {p.sku}")
-        # F-표현식 → 원자적 차감
-        Product.objects.filter(pk=p.pk).update(stock=F('stock') - q)
-        bulk_items.append(OrderItem(order=order, product=p, quantity=q, unit_price=p.price))
-        total += p.price * q
-
-    OrderItem.objects.bulk_create(bulk_items)
-    order.total_amount = total
-    order.save(update_fields=['total_amount'])
-
-    # 커밋 이후 후처리(웹훅/브로커 발행 등)는 on_commit에 넣기
-    transaction.on_commit(lambda: emit_order_created(order))
-    return order
-
-def emit_order_created(order: Order):
-    # TODO: Celery 등으로 비동기 발행
-    pass
-
-
-# 2) 중첩 트랜잭션(저장지점)으로 부분 롤백
-@transaction.atomic
-def charge_and_log(*, order: Order, amount: Decimal) -> bool:
-    try:
-        # 실패 가능성이 높은 블록을 저장지점으로 감싸기
-        with transaction.atomic():
-            Ledger.objects.create(order=order, kind='charge', amount=amount)
-            # 외부 결제 로그 동기화 등...
-        # 저장지점 성공 → 바깥 atomic과 함께 커밋
-        order.status = 'paid'
-        order.save(update_fields=['status'])
-        transaction.on_commit(lambda: emit_paid(order))
-        return True
-    except Exception:
-        # 저장지점 내부만 롤백되고, 외부 atomic은 유지
-        return False
-
-def emit_paid(order: Order):
-    pass
-
-
-# 3) 수동 저장지점 API 예시
-@transaction.atomic
-def process_with_manual_savepoint(order: Order):
-    sid = transaction.savepoint()
-    try:
-        Ledger.objects.create(order=order, kind='charge', amount=order.total_amount)
-    except IntegrityError:
-        transaction.savepoint_rollback(sid)
-    else:
-        transaction.savepoint_commit(sid)
-    # 이후 추가 처리 ...
+from collections import Counter
+from decimal import Decimal
+from django.db import connection, transaction, IntegrityError
+from .models import Product, Order, OrderItem, Ledger
+from .tx_on_commit import queue_dispatch
+
+def decrement_stock_bulk(items: list[tuple[str, int]]) -> None:
+    """(sku, qty) 목록을 CTE UPDATE 한 문장으로 검사+차감 (부족 시 ValueError)."""
+    if not items:
+        return
+    # 중복 SKU는 UPDATE ... FROM에서 한 줄만 반영되므로 먼저 SKU별로 합산
+    totals = Counter()
+    for sku, qty in items:
+        totals[sku] += qty
+    values_sql = ", ".join(["(%s::varchar, %s::integer)"] * len(totals))
+    params = [v for pair in totals.items() for v in pair]
+    table = Product._meta.db_table
+    with connection.cursor() as cur:
+        cur.execute(
+            f"""
+            WITH req(sku, qty) AS (VALUES {values_sql}),
+            upd AS (
+                UPDATE {table} p
+                   SET stock = p.stock - r.qty
+                  FROM req r
+                 WHERE p.sku = r.sku AND p.stock >= r.qty
+             RETURNING p.sku
+            )
+            SELECT r.sku FROM req r LEFT JOIN upd USING (sku) WHERE upd.sku IS NULL
+            """,
+            params,
+        )
+        rejected = [row[0] for row in cur.fetchall()]
+    if rejected:
+        raise ValueError(f"Out of stock: {', '.join(rejected)}")
+
+
+# 1) 기본: atomic 블록 하나로 '모두 성공/모두 실패'
+@transaction.atomic
+def create_order(*, user, items: list[dict]) -> Order:
+    """items = [{'sku': 'A', 'qty': 2}, ...]"""
+    # 검사+차감을 CTE UPDATE 한 문장으로: 행 잠금은 UPDATE가 잡으므로
+    # 가격 조회는 잠금 없이 필요한 컬럼만 읽는다 → 초과판매 방지 유지
+    skus = [i['sku'] for i in items]
+    products = (Product.objects
+                .only('pk', 'sku', 'price')
+                .filter(sku__in=skus)
+                .in_bulk(skus, field_name='sku'))
+
+    decrement_stock_bulk([(it['sku'], int(it['qty'])) for it in items])
+
+    # 합계를 먼저 구해 Order를 최종값으로 1회만 INSERT (사후 UPDATE 제거)
+    total = sum(
+        (products[it['sku']].price * int(it['qty']) for it in items),
+        Decimal('0.00'),
+    )
+    order = Order.objects.create(user=user, total_amount=total, status='pending')
+    bulk_items = []
+
+    for it in items:
+        p = products[it['sku']]
+        q = int(it['qty'])
+        bulk_items.append(OrderItem(order=order, product=p, quantity=q, unit_price=p.price))
+
+    # batch_size로 대형 카트에서도 파라미터 한도를 넘지 않게 분할
+    OrderItem.objects.bulk_create(bulk_items, batch_size=1000)
+
+    # 커밋 이후 후처리(웹훅/브로커 발행 등)는 queue_dispatch로 모아
+    # 트랜잭션당 on_commit 콜백 1개 + 발행 1회로 합친다
+    queue_dispatch('order_created', str(order.id))
+    return order
+
+
+# 2) 중첩 트랜잭션(저장지점)으로 부분 롤백
+@transaction.atomic
+def charge_and_log(*, order: Order, amount: Decimal) -> bool:
+    try:
+        # 실패 가능성이 높은 블록을 저장지점으로 감싸기
+        with transaction.atomic():
+            Ledger.objects.create(order=order, kind='charge', amount=amount)
+            # 외부 결제 로그 동기화 등...
+        # 저장지점 성공 → 바깥 atomic과 함께 커밋
+        order.status = 'paid'
+        order.save(update_fields=['status'])
+        queue_dispatch('order_paid', str(order.id))
+        return True
+    except Exception:
+        # 저장지점 내부만 롤백되고, 외부 atomic은 유지
+        return False
+
+
+# 3) 수동 저장지점 API 예시
+@transaction.atomic
+def process_with_manual_savepoint(order: Order):
+    sid = transaction.savepoint()
+    try:
+        Ledger.objects.create(order=order, kind='charge', amount=order.total_amount)
+    except IntegrityError:
+        transaction.savepoint_rollback(sid)
+    else:
+        transaction.savepoint_commit(sid)
+    # 이후 추가 처리 ...
@@ -1,35 +1,40 @@
-from django.db import transaction, DatabaseError
-from django.db.models import F
-from .models import Product, Order
-
-# 1) nowait 잠금: 이미 잠겨 있으면 즉시 실패
-@transaction.atomic
-def reserve_stock_nowait(*, sku: str, qty: int) -> bool:
-    try:
-        p = Product.objects.select_for_update(nowait=True).get(sku=sku)
-    except DatabaseError:
-        return False
-    if p.stock < qty:
-        return False
-    Product.objects.filter(pk=p.pk).update(stock=F('stock') - qty)
-    return True
-
-# 2) 데드락 예방: 항상 같은 순서로 자원 잠그기
-@transaction.atomic
-def swap_two_products(p1_id: int, p2_id: int):
-    a, b = sorted([p1_id, p2_id])  # 잠금 순서 고정
-    pa = Product.objects.select_for_update().get(pk=a)
-    pb = Product.objects.select_for_update().get(pk=b)
-    # ... 상태 변경 로직
-
-# 3) (PostgreSQL) skip_locked 스타일 배치 선점
-def pick_next_batch(limit=100):
-    with transaction.atomic():
-        rows = (Order.objects
-                .select_for_update(skip_locked=True)  # PG에서만 동작
-                .filter(status='pending')
-                .order_by('created_at')[:limit])
-        for o in rows:
-            o.status = 'processing'
-            o.save(update_fields=['status'])
-        return list(rows)
+from django.db import transaction
+from django.db.models import F
+from .models import Product, Order
+
+# 1) 조건부 UPDATE 한 문장: SELECT FOR UPDATE 왕복 없이 검사+차감이 원자적
+@transaction.atomic
+def reserve_stock(*, sku: str, qty: int) -> bool:
+    # stock__gte 조건이 재고 검사를 대신하고, UPDATE 자체가 행 잠금을 잡는다.
+    # 잠긴 행은 짧게 대기한다 — NOWAIT 의미론이 아니므로 이름에서도 뺐다.
+    # (즉시 False가 필요하면 SELECT 1 ... FOR UPDATE NOWAIT 가드를 raw SQL로 앞세울 것)
+    rows = Product.objects.filter(sku=sku, stock__gte=qty).update(stock=F('stock') - qty)
+    return rows == 1
+
+# 2) 데드락 예방: 항상 같은 순서로 자원 잠그기
+@transaction.atomic
+def swap_two_products(p1_id: int, p2_id: int):
+    a, b = sorted([p1_id, p2_id])  # 잠금 순서 고정
+    pa = Product.objects.select_for_update().get(pk=a)
+    pb = Product.objects.select_for_update().get(pk=b)
+    # ... 상태 변경 로직
+
+# 3) (PostgreSQL) skip_locked 스타일 배치 선점
+def pick_next_batch(limit=100):
+    # SELECT 후 행별 save() N번 → UPDATE ... RETURNING 한 문장.
+    # 잠금 유지 시간이 짧아지고 WAL fsync도 한 번으로 묶인다.
+    table = Order._meta.db_table
+    sql = f"""
+        UPDATE {table}
+           SET status = 'processing'
+         WHERE id IN (
+               SELECT id FROM {table}
+                WHERE status = 'pending'
+                ORDER BY created_at
+                  FOR UPDATE SKIP LOCKED
+                LIMIT %s
+         )
+     RETURNING *
+    """
+    with transaction.atomic():
+        return list(Order.objects.raw(sql, [limit]))
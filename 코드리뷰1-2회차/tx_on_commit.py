@@ -1,18 +1,73 @@
-from django.db import transaction
-from .models import OutboxEvent, Order
-
-def create_outbox_for_order_created(order: Order):
-    # 1) 트랜잭션 안에서 Outbox 레코드 생성
-    OutboxEvent.objects.create(
-        aggregate_type='Order',
-        aggregate_id=str(order.id),
-        event_type='OrderCreated',
-        payload={'order_id': str(order.id)},
-        status='pending',
-    )
-    # 2) 커밋 이후 디스패처 기동(브로커 전송 등)
-    transaction.on_commit(lambda: schedule_outbox_dispatch())
-
-def schedule_outbox_dispatch():
-    # TODO: Celery/커맨드에서 OutboxEvent를 읽어 전송
-    pass
+from django.db import connection, transaction
+from .models import OutboxEvent, Order
+
+def queue_dispatch(kind: str, id_: str):
+    """커밋 후 발행할 (kind, id)를 트랜잭션 단위 집합에 모은다.
+
+    같은 트랜잭션에서 N번 불려도 on_commit 콜백은 1개만 등록되고,
+    중복 (kind, id)는 set이 흡수한다 — 주문 품목 수와 무관하게
+    커밋 후 발행 RPC는 한 번이다.
+    """
+    conn = transaction.get_connection()
+    if not conn.in_atomic_block:
+        # 모아 둘 트랜잭션이 없다 — 즉시 발행 (on_commit도 이 경우 즉시 실행)
+        _dispatch(kind, id_)
+        return
+    pending = getattr(conn, '_pending_dispatches', None)
+    # 롤백되면 Django는 on_commit 콜백만 버리고 연결에 남긴 set은 못 본다.
+    # run_on_commit 목록에 _drain_pending이 없으면 이전(롤백된) 트랜잭션의
+    # 잔여물이므로 버리고 새로 시작한다 — set이 트랜잭션보다 오래 살지 않게.
+    if pending is None or not any(
+        entry[1] is _drain_pending for entry in conn.run_on_commit
+    ):
+        conn._pending_dispatches = pending = set()
+        transaction.on_commit(_drain_pending)
+    pending.add((kind, id_))
+
+def _drain_pending():
+    conn = transaction.get_connection()
+    pending, conn._pending_dispatches = conn._pending_dispatches, None
+    for kind, id_ in pending:
+        _dispatch(kind, id_)
+
+def _dispatch(kind: str, id_: str):
+    # TODO: kind별로 Celery 태스크/웹훅 발행
+    pass
+
+def create_outbox_events_bulk(events: list[dict]):
+    """Outbox 레코드를 multi-value INSERT 한 번으로 적재한다.
+
+    events = [{'aggregate_type': ..., 'aggregate_id': ..., 'event_type': ..., 'payload': ...}]
+    배치 주문 수집처럼 루프에서 불릴 때 INSERT N번 + on_commit N번이
+    INSERT 1번 + on_commit 1번으로 줄어든다.
+    """
+    OutboxEvent.objects.bulk_create(
+        [OutboxEvent(status='pending', **e) for e in events],
+        batch_size=1000,
+    )
+    _schedule_dispatch_once()
+
+def _schedule_dispatch_once():
+    # 같은 트랜잭션에서 몇 번을 불려도 디스패처 깨우기는 커밋 후 1회.
+    # 연결 객체에 불리언 플래그를 남기면 롤백 시 on_commit 콜백만 폐기되고
+    # 플래그는 True로 남아 이후 디스패치가 영구히 막힌다 — Django가
+    # 트랜잭션과 함께 비워 주는 run_on_commit 목록으로 중복 등록을 판별한다.
+    if any(entry[1] is notify_outbox_ready for entry in connection.run_on_commit):
+        return
+    transaction.on_commit(notify_outbox_ready)
+
+def notify_outbox_ready():
+    # 주문마다 Celery 태스크를 enqueue하는 대신 DB 사이드 채널 한 번.
+    # 워커는 psycopg Connection.notifies()로 LISTEN outbox_ready 하고 있다가
+    # 깨어나서 outbox 테이블을 읽는다 — 폴링도, 브로커 RPC도 없다.
+    with connection.cursor() as cur:
+        cur.execute("NOTIFY outbox_ready")
+
+def create_outbox_for_order_created(order: Order):
+    # 단건 경로도 배치 경로의 얇은 래퍼로 유지
+    create_outbox_events_bulk([{
+        'aggregate_type': 'Order',
+        'aggregate_id': str(order.id),
+        'event_type': 'OrderCreated',
+        'payload': {'order_id': str(order.id)},
+    }])
@@ -1,41 +1,43 @@
-import time
-from functools import wraps
-from django.db import transaction
-
-# PostgreSQL 예: 직렬화 실패/데드락 에러코드
-PG_RETRY_ERRCODES = {'40001', '40P01'}
-
-def _pgcode_from(exc: Exception):
-    return getattr(exc, 'pgcode', None) or getattr(getattr(exc, '__cause__', None), 'pgcode', None)
-
-def is_retryable(exc: Exception) -> bool:
-    code = _pgcode_from(exc)
-    if code and code in PG_RETRY_ERRCODES:
-        return True
-    msg = str(exc).lower()
-    return any(k in msg for k in ('deadlock detected', 'could not serialize access'))
-
-def retry_on_tx_failure(max_attempts=3, backoff=0.05):
-    """idempotent 구간에만 적용할 것!"""
-    def deco(fn):
-        @wraps(fn)
-        def wrapper(*args, **kwargs):
-            attempt = 0
-            while True:
-                attempt += 1
-                try:
-                    return fn(*args, **kwargs)
-                except Exception as e:
-                    if attempt >= max_attempts or not is_retryable(e):
-                        raise
-                    time.sleep(backoff * attempt)
-        return wrapper
-    return deco
-
-@retry_on_tx_failure(max_attempts=5, backoff=0.1)
-@transaction.atomic
-def safe_increment_counter(model_cls, pk):
-    obj = model_cls.objects.select_for_update().get(pk=pk)
-    obj.counter = obj.counter + 1
-    obj.save(update_fields=['counter'])
-    return obj.counter
+import random
+import time
+from functools import wraps
+from django.db import transaction
+
+# PostgreSQL 예: 직렬화 실패/데드락 에러코드
+PG_RETRY_ERRCODES = frozenset({'40001', '40P01'})
+
+def _pgcode_from(exc: Exception):
+    return getattr(exc, 'pgcode', None) or getattr(getattr(exc, '__cause__', None), 'pgcode', None)
+
+def is_retryable(exc: Exception) -> bool:
+    # pgcode만 본다: str(exc).lower() 부분 문자열 검색은 실패마다
+    # 메시지 전체를 복사/스캔하는 데다 오탐 여지도 있다
+    return _pgcode_from(exc) in PG_RETRY_ERRCODES
+
+def retry_on_tx_failure(max_attempts=3, backoff=0.05, cap=1.0):
+    """idempotent 구간에만 적용할 것!"""
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            attempt = 0
+            while True:
+                attempt += 1
+                try:
+                    return fn(*args, **kwargs)
+                except Exception as e:
+                    if attempt >= max_attempts or not is_retryable(e):
+                        raise
+                    # 지수 백오프 + 풀 지터: 경합한 트랜잭션들이 같은 간격으로
+                    # 동시에 재시도하며 같은 데드락을 반복하는 것을 방지
+                    time.sleep(min(cap, random.uniform(0, backoff * (1 << attempt))))
+        return wrapper
+    return deco
+
+@retry_on_tx_failure(max_attempts=5, backoff=0.1)
+@transaction.atomic
+def safe_increment_counter(model_cls, pk):
+    # 잠금 SELECT도 필요한 컬럼만: 행이 커져도(TOAST 등) 전송 바이트가 일정
+    obj = model_cls.objects.select_for_update().only('pk', 'counter').get(pk=pk)
+    obj.counter = obj.counter + 1
+    obj.save(update_fields=['counter'])
+    return obj.counter
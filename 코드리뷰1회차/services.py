@@ -1,36 +1,116 @@
-from decimal import Decimal
-from django.db import transaction
-from django.db.models import F
-from .models import Product, Order, OrderItem
-
-@transaction.atomic
-def create_order(*, user, items: list[dict]) -> Order:
-    # 일괄 조회 + 행 잠금으로 동시성/경쟁조건 방어
-    skus = [i["sku"] for i in items]
-    by_sku = {p.sku: p for p in Product.objects.select_for_update().filter(sku__in=skus)}
-
-    total = Decimal("0.00")
-    order = Order.objects.create(user=user, total_amount=Decimal("0.00"))
-
-    bulk_items = []
-    for it in items:
-        p = by_sku.get(it["sku"])
-        if not p:
-            raise ValueError(f"Unknown SKU: {it['sku']}")
-        q = int(it["quantity"])
-        if p.stock < q:
-            raise ValueError(f"Out of stock: {p.sku}")
-        Product.objects.filter(pk=p.pk).update(stock=F("stock") - q)
-        bulk_items.append(OrderItem(order=order, product=p, quantity=q, unit_price=p.price))
-        total += p.price * q
-
-    OrderItem.objects.bulk_create(bulk_items)
-    order.total_amount = total
-    order.save(update_fields=["total_amount"])
-
-    transaction.on_commit(lambda: publish_order_created(order.id))
-    return order
-
-def publish_order_created(order_id: str):
-    # 실제로는 Celery 등으로 발행
-    pass
+from collections import Counter
+from decimal import Decimal
+from functools import partial
+from django.db import connection, transaction
+from .models import Product, Order, OrderItem
+
+def decrement_stock_bulk(items: list[tuple[str, int]]) -> None:
+    """(sku, qty) 목록을 CTE 한 문장으로 검사+차감한다.
+
+    UPDATE ... FROM이 행 잠금을 잡으므로 별도의 SELECT FOR UPDATE가 필요 없고,
+    재고 부족/미존재 SKU는 RETURNING과의 LEFT JOIN으로 한 번에 걸러낸다.
+    """
+    if not items:
+        return
+    # 같은 SKU가 여러 줄로 오면 UPDATE ... FROM은 대상 행에 req 한 줄만
+    # 적용한다(초과판매) — VALUES를 만들기 전에 SKU별로 합산한다
+    totals = Counter()
+    for sku, qty in items:
+        totals[sku] += qty
+    values_sql = ", ".join(["(%s::varchar, %s::integer)"] * len(totals))
+    params = [v for pair in totals.items() for v in pair]
+    table = Product._meta.db_table
+    with connection.cursor() as cur:
+        cur.execute(
+            f"""
+            WITH req(sku, qty) AS (VALUES {values_sql}),
+            upd AS (
+                UPDATE {table} p
+                   SET stock = p.stock - r.qty
+                  FROM req r
+                 WHERE p.sku = r.sku AND p.stock >= r.qty
+             RETURNING p.sku
+            )
+            SELECT r.sku FROM req r LEFT JOIN upd USING (sku) WHERE upd.sku IS NULL
+            """,
+            params,
+        )
+        rejected = [row[0] for row in cur.fetchall()]
+    if rejected:
+        raise ValueError(f"Out of stock: {', '.join(rejected)}")
+
+
+@transaction.atomic
+def adjust_stock_bulk(pairs: list[tuple[int, int]]) -> None:
+    """(product_pk, delta) 목록을 bulk_update 한 번으로 반영한다.
+
+    관리자 일괄 보정처럼 경합이 없는 작업용 — 행별 F() UPDATE N번 대신
+    UPDATE를 batch_size 단위로 묶는다. 주문 경로의 원자적 차감
+    (decrement_stock_bulk)을 대체하지 않는다.
+    """
+    deltas = dict(pairs)
+    products = Product.objects.only("pk", "stock").in_bulk(deltas)
+    for pk, p in products.items():
+        p.stock += deltas[pk]
+    Product.objects.bulk_update(products.values(), ["stock"], batch_size=1000)
+
+
+def _create_order_single(*, user, it: dict) -> Order:
+    # 실서비스 카트 대부분은 1품목 — 제너릭 경로의 리스트/딕셔너리 구성과
+    # 루프 바이트코드를 건너뛰는 특수화 경로
+    sku = it["sku"]
+    q = int(it["quantity"])
+    p = Product.objects.only("pk", "sku", "price").filter(sku=sku).first()
+    if p is None:
+        raise ValueError(f"Unknown SKU: {sku}")
+    decrement_stock_bulk([(sku, q)])
+    order = Order.objects.create(user=user, total_amount=p.price * q)
+    OrderItem.objects.create(order=order, product=p, quantity=q, unit_price=p.price)
+    transaction.on_commit(partial(publish_order_created, order.id))
+    return order
+
+
+@transaction.atomic
+def create_order(*, user, items: list[dict]) -> Order:
+    # 카트 크기에 따라 특수화 경로로 분기
+    if len(items) == 1:
+        return _create_order_single(user=user, it=items[0])
+
+    # 재고 검사+차감은 CTE UPDATE 한 문장이 행 잠금까지 처리하므로
+    # 가격 조회는 잠금 없이 필요한 컬럼만 읽는다. values_list는 모델
+    # 인스턴스를 만들지 않아 행당 메타클래스/디스크립터 비용이 없다
+    skus = [i["sku"] for i in items]
+    rows = Product.objects.filter(sku__in=skus).values_list("pk", "sku", "price")
+    by_sku = {sku: (pk, price) for (pk, sku, price) in rows}
+    for it in items:
+        if it["sku"] not in by_sku:
+            raise ValueError(f"Unknown SKU: {it['sku']}")
+
+    decrement_stock_bulk([(it["sku"], int(it["quantity"])) for it in items])
+
+    # 합계를 먼저 구해 Order를 최종값으로 1회만 INSERT (사후 UPDATE 제거)
+    # Decimal 곱셈은 연산마다 객체를 할당하므로 정수 센트로 누적하고
+    # 저장 직전에 한 번만 Decimal로 되돌린다
+    prices_cents = {sku: int(price * 100) for sku, (_, price) in by_sku.items()}
+    total_cents = 0
+    for it in items:
+        total_cents += prices_cents[it["sku"]] * int(it["quantity"])
+    order = Order.objects.create(user=user, total_amount=Decimal(total_cents) / 100)
+
+    bulk_items = []
+    for it in items:
+        pk, price = by_sku[it["sku"]]
+        q = int(it["quantity"])
+        # product_id로 FK를 직접 지정 — Product 디스크립터 경유를 건너뛴다
+        bulk_items.append(OrderItem(order=order, product_id=pk, quantity=q, unit_price=price))
+
+    # batch_size로 대형 카트에서도 파라미터 한도를 넘지 않게 분할
+    OrderItem.objects.bulk_create(bulk_items, batch_size=1000)
+
+    # partial은 C 구현 callable — 람다 클로저 셀/프레임 할당이 없다
+    transaction.on_commit(partial(publish_order_created, order.id))
+    return order
+
+def publish_order_created(order_id: str):
+    # 실제로는 Celery 등으로 발행
+    pass
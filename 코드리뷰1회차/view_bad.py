@@ -1,40 +1,49 @@
-import json
-from django.http import JsonResponse
-from .models import Product, Order, OrderItem
-
-def create_order(request):
-    data = json.loads(request.body)              
-    items = data.get("items", [])               
-    order = Order.objects.create(user=request.user, total_amount=0)
-
-    total = 0.0                                  
-    for it in items:
-        prod = Product.objects.get(sku=it["sku"])  
-        if prod.stock < it["quantity"]:            
-            return JsonResponse({"error": "out of stock"}, status=400)
-        prod.stock -= it["quantity"]
-        prod.save()                                
-
-        OrderItem.objects.create(
-            order=order, product=prod,
-            quantity=it["quantity"], unit_price=prod.price
-        )
-        total += float(prod.price) * it["quantity"]
-
-    order.total_amount = total
-    order.save()
-    notify_webhook(order.id)                   
-    return JsonResponse({"id": str(order.id), "total": total}, status=200)  
-
-
-def list_orders(request):
-    qs = Order.objects.filter(user=request.user).order_by("-created_at")  
-    data = []
-    for o in qs:                                       
-        items = [{"sku": it.product.sku,               
-                  "qty": it.quantity,
-                  "price": str(it.unit_price)} for it in o.items.all()]
-        data.append({"id": str(o.id),
-                     "total": str(o.total_amount),
-                     "items": items})
+import json
+from django.db.models import Prefetch
+from django.http import JsonResponse
+from .models import Product, Order, OrderItem
+
+def create_order(request):
+    data = json.loads(request.body)              
+    items = data.get("items", [])               
+    order = Order.objects.create(user=request.user, total_amount=0)
+
+    total = 0.0                                  
+    for it in items:
+        prod = Product.objects.get(sku=it["sku"])  
+        if prod.stock < it["quantity"]:            
+            return JsonResponse({"error": "out of stock"}, status=400)
+        prod.stock -= it["quantity"]
+        prod.save()                                
+
+        OrderItem.objects.create(
+            order=order, product=prod,
+            quantity=it["quantity"], unit_price=prod.price
+        )
+        total += float(prod.price) * it["quantity"]
+
+    order.total_amount = total
+    order.save()
+    notify_webhook(order.id)                   
+    return JsonResponse({"id": str(order.id), "total": total}, status=200)  
+
+
+def list_orders(request):
+    # N+1 제거: 주문당 items 쿼리 + 아이템당 product 쿼리 → 전체 2쿼리
+    # (only()에 order_id를 포함해야 prefetch 결과를 주문에 다시 붙일 수 있다)
+    qs = (Order.objects.filter(user=request.user)
+          .order_by("-created_at")
+          .prefetch_related(Prefetch(
+              "items",
+              queryset=OrderItem.objects.select_related("product")
+                                        .only("order_id", "quantity",
+                                              "unit_price", "product__sku"))))
+    data = []
+    for o in qs:
+        items = [{"sku": it.product.sku,
+                  "qty": it.quantity,
+                  "price": str(it.unit_price)} for it in o.items.all()]
+        data.append({"id": str(o.id),
+                     "total": str(o.total_amount),
+                     "items": items})
     return JsonResponse({"results": data})             
\ No newline at end of file